@@ -1,229 +1,440 @@
 from collections import namedtuple
-import math
+from functools import lru_cache
 import argparse
-import json
+import os
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+try:
+    from orjson import loads
+except ImportError:
+    from json import loads
 
 # Type definitions
-Portal = namedtuple("Portal", ["label", "position", "is_nether"])
 Position = namedtuple("Position", ["x", "y", "z"])
 
-# Parse CLI arguments
-parser = argparse.ArgumentParser(
-    prog='python npt.py',
-    description='Show all portal connections and test new portals.',
-)
-subparsers = parser.add_subparsers(help='The command to execute.', dest='command', required=True)
-parser_show_connections = subparsers.add_parser('show_connections', help='Show all portal connections')
-parser_show_connections.add_argument('-p', '--portal', help="Show only information for a specific portal")
+class Portal:
+    """A portal with its coordinates in the other realm (cx, cz) worked out up front."""
 
-parser_check_portal = subparsers.add_parser("check_new_portal", help="Checks if a portal can be constructed")
-parser_check_portal.add_argument('overworld_coords', help='Overworld coordinates in x/y/z')
-parser_check_portal.add_argument('nether_coords', help='Nether coordinates in x/y/z or - to use the converted coordinate on the nether roof')
-parser_check_portal.add_argument('-t', '--threshold', help='Number of blocks to check around the input', type=int, default=0)
+    __slots__ = ("label", "x", "y", "z", "is_nether", "cx", "cz", "threshold")
 
-parser.add_argument('-d', '--data', default='./data/mcandy_portals.json', help="The JSON data to load.")
-args = parser.parse_args()
+    def __init__(self, label, position, is_nether):
+        self.label = label
+        self.x, self.y, self.z = position
+        self.is_nether = is_nether
+        # How far in XZ from (cx, cz) a portal in the other realm can be to link with this one
+        self.threshold = 128 if is_nether else 16
+        if is_nether:
+            self.cx, self.cz = self.x << 3, self.z << 3
+        else:
+            self.cx, self.cz = self.x // 8, self.z // 8
+
+    @property
+    def position(self):
+        return Position(x=self.x, y=self.y, z=self.z)
+
+    def __repr__(self):
+        return f"Portal(label={self.label!r}, position={self.position!r}, is_nether={self.is_nether!r})"
+
+class GridIndex:
+    """Buckets portals into square XZ cells so box queries only visit nearby cells.
+
+    Each cell keeps its coordinates in parallel lists, so the box test and distance
+    calculations run on plain ints instead of going through the portal objects.
+    """
+
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.inserted = 0
+
+    def _cell(self, x, z):
+        return (x // self.cell_size, z // self.cell_size)
+
+    def insert(self, portal):
+        x, z = portal.x, portal.z
+        cell = self.cells.get(self._cell(x, z))
+        if cell is None:
+            cell = self.cells[self._cell(x, z)] = ([], [], [], [], [])
+        order, xs, ys, zs, items = cell
+        # Remember insertion order so results come back in the same order as a full scan
+        order.append(self.inserted)
+        xs.append(x)
+        ys.append(portal.y)
+        zs.append(z)
+        items.append(portal)
+        self.inserted += 1
+
+    def remove(self, portal):
+        key = self._cell(portal.x, portal.z)
+        cell = self.cells[key]
+        items = cell[-1]
+        for i, p in enumerate(items):
+            if p is portal:
+                for column in cell:
+                    del column[i]
+                break
+        if len(items) == 0:
+            del self.cells[key]
+
+    def intersection(self, x, z, radius):
+        """Returns the portals whose XZ position lies within the box."""
+        min_cx, min_cz = self._cell(x - radius, z - radius)
+        max_cx, max_cz = self._cell(x + radius, z + radius)
+        found = []
+        for cx in range(min_cx, max_cx + 1):
+            for cz in range(min_cz, max_cz + 1):
+                cell = self.cells.get((cx, cz))
+                if cell is None:
+                    continue
+                order, xs, ys, zs, items = cell
+                for i in range(len(items)):
+                    if max(abs(xs[i] - x), abs(zs[i] - z)) <= radius:
+                        found.append((order[i], items[i]))
+        found.sort()
+        return [p for _, p in found]
+
+    def nearest(self, x, y, z, radius):
+        """Returns the closest portal to (x, y, z) whose XZ position lies within the box, or None.
+
+        Filters and picks the minimum in the same pass; distance ties go to the earliest inserted portal.
+        """
+        min_cx, min_cz = self._cell(x - radius, z - radius)
+        max_cx, max_cz = self._cell(x + radius, z + radius)
+        best = None
+        best_dist = 0
+        best_order = 0
+        for cx in range(min_cx, max_cx + 1):
+            for cz in range(min_cz, max_cz + 1):
+                cell = self.cells.get((cx, cz))
+                if cell is None:
+                    continue
+                order, xs, ys, zs, items = cell
+                for i in range(len(items)):
+                    dx = xs[i] - x
+                    dz = zs[i] - z
+                    if max(abs(dx), abs(dz)) > radius:
+                        continue
+                    dy = ys[i] - y
+                    # Squared distance orders portals the same way as the true distance without a sqrt
+                    dist = dx * dx + dy * dy + dz * dz
+                    if best is None or dist < best_dist or (dist == best_dist and order[i] < best_order):
+                        best = items[i]
+                        best_dist = dist
+                        best_order = order[i]
+        return best
 
 # Load the portal data
-portals = []
-with open(args.data, "r") as file:
-    data = json.loads(file.read())
-    
-    if "overworld_portals" not in data or "nether_portals" not in data:
-        raise Exception("Invalid data format: expected to have a top-level JSON object with keys 'overworld_portals' and 'nether_portals'")
-    
-    overworld_portals = data["overworld_portals"]
-    nether_portals = data["nether_portals"]
-
-    def validate_portal_json(portal):
-        if "label" not in portal:
-            raise Exception(f"Missing label for portal: {portal}")
-        if "position" not in portal:
-            raise Exception(f"Missing position for portal: {portal}")
-        position = portal["position"]
-        if "x" not in position or not isinstance(position["x"], int):
-            raise Exception(f"Position must have property 'x' that is an integer for portal: {portal}")
-        if "y" not in position or not isinstance(position["y"], int):
-            raise Exception(f"Position must have property 'y' that is an integer for portal: {portal}")
-        if "z" not in position or not isinstance(position["z"], int):
-            raise Exception(f"Position must have property 'z' that is an integer for portal: {portal}")
+REALM_KEYS = {"overworld_portals": False, "nether_portals": True}
+
+def validate_portal_json(portal):
+    if "label" not in portal:
+        raise Exception(f"Missing label for portal: {portal}")
+    if "position" not in portal:
+        raise Exception(f"Missing position for portal: {portal}")
+    position = portal["position"]
+    if "x" not in position or not isinstance(position["x"], int):
+        raise Exception(f"Position must have property 'x' that is an integer for portal: {portal}")
+    if "y" not in position or not isinstance(position["y"], int):
+        raise Exception(f"Position must have property 'y' that is an integer for portal: {portal}")
+    if "z" not in position or not isinstance(position["z"], int):
+        raise Exception(f"Position must have property 'z' that is an integer for portal: {portal}")
+
+INVALID_FORMAT = "Invalid data format: expected to have a top-level JSON object with keys 'overworld_portals' and 'nether_portals'"
+
+def scan_realm_keys(file):
+    """Returns how many times each realm key appears at the top level, raising unless each one holds an array."""
+    counts = {key: 0 for key in REALM_KEYS}
+    pending = None
+    for prefix, event, value in ijson.parse(file):
+        if pending is not None:
+            if event != "start_array":
+                raise Exception(INVALID_FORMAT)
+            counts[pending] += 1
+            pending = None
+        elif prefix == "" and event == "map_key" and value in REALM_KEYS:
+            pending = value
+
+    if any(count == 0 for count in counts.values()):
+        raise Exception(INVALID_FORMAT)
+    return counts
+
+def stream_portal_json(file):
+    """Yields (realm key, portal object) pairs, building only one portal object at a time.
+
+    The file is checked for the realm arrays in a first pass so malformed files fail the same
+    way as with read_portal_json; like json, a duplicated realm key keeps only its last array.
+    """
+    counts = scan_realm_keys(file)
+    file.seek(0)
+
+    seen = {key: 0 for key in REALM_KEYS}
+    active = set()
+    builder = None
+    for prefix, event, value in ijson.parse(file):
+        if prefix == "" and event == "map_key" and value in REALM_KEYS:
+            seen[value] += 1
+            if seen[value] == counts[value]:
+                active.add(value)
+            else:
+                active.discard(value)
+        elif builder is not None:
+            builder.event(event, value)
+            if prefix.endswith(".item") and prefix[:-5] in active and event == "end_map":
+                yield prefix[:-5], builder.value
+                builder = None
+        elif prefix.endswith(".item") and prefix[:-5] in active:
+            if event == "start_map":
+                builder = ijson.ObjectBuilder()
+                builder.event(event, value)
+            else:
+                # Not an object, let validation report it
+                yield prefix[:-5], value
+
+def read_portal_json(file):
+    """Yields (realm key, portal object) pairs from the whole document parsed at once."""
+    data = loads(file.read())
+
+    if not isinstance(data, dict) or any(not isinstance(data.get(key), list) for key in REALM_KEYS):
+        raise Exception(INVALID_FORMAT)
+
+    for key in REALM_KEYS:
+        for portal in data[key]:
+            yield key, portal
+
+PortalData = namedtuple("PortalData", [
+    "portals", "overworld_portals", "nether_portals", "portals_by_label",
+    "overworld_index", "nether_index", "overworld_positions", "nether_positions",
+])
+
+def read_portal_data(path, stream=False):
+    """Builds the portal lists, lookups and indexes for a data file."""
+    if stream and ijson is None:
+        raise Exception("Streaming the data file requires the ijson package")
+
+    with open(path, "rb") as file:
+        realm_portals = {key: [] for key in REALM_KEYS}
+        # Whole-file parsing is much faster, and the portals and indexes dominate memory either way,
+        # so streaming is only used when asked for
+        for key, portal in (stream_portal_json(file) if stream else read_portal_json(file)):
+            validate_portal_json(portal)
+            realm_portals[key].append(Portal(label=portal["label"], position=Position(x=portal["position"]["x"], y=portal["position"]["y"], z=portal["position"]["z"]), is_nether=REALM_KEYS[key]))
+
+    # The loaded portals never change, so the per-realm lists are built once here
+    overworld_portals = realm_portals["overworld_portals"]
+    nether_portals = realm_portals["nether_portals"]
+    portals = overworld_portals + nether_portals
+
+    # Index each realm with cells as large as the search box used when looking up into it
+    overworld_index = GridIndex(128)
+    nether_index = GridIndex(16)
+
+    # Labels are looked up often enough to keep a map alongside the list; the first portal with a label wins
+    portals_by_label = {}
+
+    for portal in portals:
+        portals_by_label.setdefault(portal.label, portal)
+        (nether_index if portal.is_nether else overworld_index).insert(portal)
 
+    # Exact positions taken in each realm, used to reject new portals that would sit on an existing one
+    overworld_positions = {}
     for portal in overworld_portals:
-        validate_portal_json(portal)
-        portals.append(Portal(label=portal["label"], position=Position(x=portal["position"]["x"], y=portal["position"]["y"], z=portal["position"]["z"]), is_nether=False))
+        overworld_positions.setdefault((portal.x, portal.y, portal.z), portal)
+    nether_positions = {}
     for portal in nether_portals:
-        validate_portal_json(portal)
-        portals.append(Portal(label=portal["label"], position=Position(x=portal["position"]["x"], y=portal["position"]["y"], z=portal["position"]["z"]), is_nether=True))
+        nether_positions.setdefault((portal.x, portal.y, portal.z), portal)
+
+    return PortalData(portals, overworld_portals, nether_portals, portals_by_label,
+                      overworld_index, nether_index, overworld_positions, nether_positions)
+
+# One entry per resolved data file path, holding (mtime, PortalData); replaced when the file changes
+portal_data_cache = {}
+
+def load_portals(path, stream=False):
+    """Makes the portals in the data file the ones all lookups below work on.
+
+    Loading the same unchanged file again reuses the portals and indexes built the first time.
+    Those objects are shared between loads, and check_new_portal temporarily inserts into the
+    grid indexes while it runs, so don't use the same data from another thread at the same time.
+    Pass stream=True to parse the file incrementally with ijson instead of all at once.
+    """
+    global portals, overworld_portals, nether_portals, portals_by_label
+    global overworld_index, nether_index, overworld_positions, nether_positions
+
+    path = os.path.realpath(path)
+    mtime = os.path.getmtime(path)
+    cached = portal_data_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = portal_data_cache[path] = (mtime, read_portal_data(path, stream))
+    data = cached[1]
+    (portals, overworld_portals, nether_portals, portals_by_label,
+     overworld_index, nether_index, overworld_positions, nether_positions) = data
+    get_base_connections.cache_clear()
+    return data
+
+def get_realm_index(is_nether):
+    return nether_index if is_nether else overworld_index
 
 def get_converted_coordinates(portal):
-    if portal.is_nether:
-        return convert_to_overworld(portal.position)
-    else:
-        return convert_to_nether(portal.position)
+    return Position(x=portal.cx, y=portal.y, z=portal.cz)
 
 def convert_to_nether(pos):
-    return Position(x=math.floor(pos.x / 8), y=pos.y, z=math.floor(pos.z / 8))
+    # Floor division rounds towards negative infinity, the same as math.floor, without going through a float
+    return Position(x=pos.x // 8, y=pos.y, z=pos.z // 8)
 
 def convert_to_overworld(pos):
-    return Position(x=math.floor(pos.x * 8), y=pos.y, z=math.floor(pos.z * 8))
+    return Position(x=pos.x << 3, y=pos.y, z=pos.z << 3)
 
 def valid_portal_destination(portal, pos):
-    threshold = 128 if portal.is_nether else 16
-    converted_pos = get_converted_coordinates(portal)
-
-    return abs(converted_pos.x - pos.x) <= threshold and abs(converted_pos.z - pos.z) <= threshold
-
-def euclidean_dist(pos1, pos2):
-    return math.sqrt(math.pow(pos2.x - pos1.x, 2) + math.pow(pos2.y - pos1.y, 2) + math.pow(pos2.z - pos1.z, 2))
+    return max(abs(portal.cx - pos.x), abs(portal.cz - pos.z)) <= portal.threshold
 
-def find_valid_portal_connections(portal):
-    valid = []
-    for p in portals:
-        if p == portal:
-            continue
-        if portal.is_nether == p.is_nether:
-            continue
-        if valid_portal_destination(portal, p.position):
-            valid.append(p)
-    return valid
+def find_portals_reaching(portal):
+    """Returns the portals of the other realm whose search box contains the given portal."""
+    # Converting rounds to whole blocks, so widen the box slightly and let valid_portal_destination decide
+    radius = 16 * 8 + 7 if portal.is_nether else 128 // 8 + 1
+    candidates = get_realm_index(not portal.is_nether).intersection(portal.cx, portal.cz, radius)
+    position = portal.position
+    return [p for p in candidates if valid_portal_destination(p, position)]
 
 def find_nether_connection(portal):
-    valid = find_valid_portal_connections(portal)
-    if len(valid) == 0:
-        return None
-    
-    converted_pos = get_converted_coordinates(portal)
-    first = valid.pop(0)
-    destination = first
-    min_dist = euclidean_dist(converted_pos, first.position)
-    for p in valid:
-        dist = euclidean_dist(converted_pos, p.position)
-        if dist < min_dist:
-            min_dist = dist
-            destination = p
-    
-    return destination
+    return get_realm_index(not portal.is_nether).nearest(portal.cx, portal.y, portal.cz, portal.threshold)
 
 def get_portal_by_name(name, error=False):
-    for p in portals:
-        if p.label == name:
-            return p
-    if error:
+    portal = portals_by_label.get(name)
+    if portal is None and error:
         raise Exception(f"{name} is not a known portal.")
-    return None
+    return portal
 
-def get_connections():
-    overworld_portals = list(filter(lambda p: p.is_nether == False, portals))
-    nether_portals = list(filter(lambda p: p.is_nether == True, portals))
+def get_nearest_connections():
+    """Maps each portal label to the label of the portal it links to, or None if it would create one."""
+    nearest = {}
+    for portal in portals:
+        connection = find_nether_connection(portal)
+        nearest[portal.label] = connection.label if connection else None
+    return nearest
 
-    connections = {}
+def get_connections(nearest=None):
+    if nearest is None:
+        nearest = get_nearest_connections()
 
-    for portal in overworld_portals:
-        connection = find_nether_connection(portal)
-        connections[portal.label] = connection.label if connection else f"New portal near {get_converted_coordinates(portal)}"
-    
-    for portal in nether_portals:
-        connection = find_nether_connection(portal)
-        connections[portal.label] = connection.label if connection else f"New portal near {get_converted_coordinates(portal)}"
-    
+    connections = {}
+    for portal in portals:
+        connection = nearest[portal.label]
+        connections[portal.label] = connection if connection else f"New portal near {get_converted_coordinates(portal)}"
     return connections
 
+# Every new portal is compared against the same connections between the loaded portals, so compute them once
+@lru_cache(maxsize=None)
+def get_base_connections():
+    return get_connections()
+
 def print_connections(target=None):
-    overworld_portals = list(filter(lambda p: p.is_nether == False, portals))
-    nether_portals = list(filter(lambda p: p.is_nether == True, portals))
+    nearest = get_nearest_connections()
+    connections = get_connections(nearest)
 
-    connections = {}
     bidirectional = []
-
-    for portal in overworld_portals:
-        connection = find_nether_connection(portal)
-        connections[portal.label] = connection.label if connection else f"New portal near {get_converted_coordinates(portal)}"
-    
     for portal in nether_portals:
-        connection = find_nether_connection(portal)
-        existing_conn = connections[connection.label] if connection.label in connections else None
-        if existing_conn == portal.label:
-            del connections[connection.label]
-            bidirectional.append([connection.label, portal.label])
-        else:
-            connections[portal.label] = connection.label if connection else f"New portal near {get_converted_coordinates(portal)}"
-    
+        connection = nearest[portal.label]
+        if connection and nearest[connection] == portal.label:
+            bidirectional.append([connection, portal.label])
+    for left, right in bidirectional:
+        del connections[left]
+        del connections[right]
+
     if target:
-        to_remove = []
-        for key in connections.keys():
-            if key != target.label and connections[key] != target.label:
-                to_remove.append(key)
-        for key in to_remove:
-            del connections[key]
-
-        bidirectional = list(filter(lambda p: p[0] == target.label or p[1] == target.label, bidirectional))
-
-    print("-----------------------")
-    print("Bi-directional portals:")
-    print("-----------------------")
+        connections = {key: value for key, value in connections.items() if key == target.label or value == target.label}
+        bidirectional = [pair for pair in bidirectional if pair[0] == target.label or pair[1] == target.label]
+
+    # Collect the report and write it out in one go rather than one print per line
+    lines = []
+    lines.append("-----------------------")
+    lines.append("Bi-directional portals:")
+    lines.append("-----------------------")
     for left, right in bidirectional:
-        print(left + " <-> " + right)
-    print("\n")
+        lines.append(left + " <-> " + right)
+    lines.append("\n")
 
-    print("-----------------------")
-    print("Overworld portals:")
-    print("-----------------------")
+    lines.append("-----------------------")
+    lines.append("Overworld portals:")
+    lines.append("-----------------------")
     for portal in overworld_portals:
         if portal.label not in connections:
             continue
-        print(portal.label + " -> " + connections[portal.label])
-    print("\n")
+        lines.append(portal.label + " -> " + connections[portal.label])
+    lines.append("\n")
 
-    print("-----------------------")
-    print("Nether portals:")
-    print("-----------------------")
+    lines.append("-----------------------")
+    lines.append("Nether portals:")
+    lines.append("-----------------------")
     for portal in nether_portals:
         if portal.label not in connections:
             continue
-        print(portal.label + " -> " + connections[portal.label])
-    print("\n")
+        lines.append(portal.label + " -> " + connections[portal.label])
+    lines.append("\n")
+
+    print("\n".join(lines))
 
 def parse_coords(coords_string):
     [x,y,z] = coords_string.split("/")
     return Position(x=int(x), y=int(y), z=int(z))
 
+def iter_shell_offsets(radius):
+    """Yields every (x, y, z) offset whose largest absolute component is exactly radius."""
+    for x in range(-radius, radius + 1):
+        for y in range(-radius, radius + 1):
+            if abs(x) == radius or abs(y) == radius:
+                zs = range(-radius, radius + 1)
+            else:
+                zs = (-radius, radius)
+            for z in zs:
+                yield x, y, z
+
 def check_new_portal(overworld_pos, nether_pos, silent=False):
-    def print_if(str=''):
+    lines = []
+    try:
+        return check_new_portal_lines(overworld_pos, nether_pos, lines)
+    finally:
         if not silent:
-            print(str)
+            print("\n".join(lines))
 
-    print_if("Checking portals...")
-    print_if(f"Overworld: {overworld_pos}")
-    print_if(f"Nether: {nether_pos}")
-    print_if()
+def check_new_portal_lines(overworld_pos, nether_pos, lines):
+    """Checks a new portal pair, appending the report to lines instead of printing it."""
+    def report(str=''):
+        lines.append(str)
+
+    report("Checking portals...")
+    report(f"Overworld: {overworld_pos}")
+    report(f"Nether: {nether_pos}")
+    report()
 
-    converted = convert_to_nether(overworld_pos)
-    if nether_pos.x > converted.x + 16 or nether_pos.x < converted.x - 16 or nether_pos.z > converted.z + 16 or nether_pos.z < converted.z - 16:
-        print_if("VIOLATION: Invalid nether position. Must be within 16 XZ blocks after converting the overworld position.")
-        return False
-    
-    for portal in portals:
-        if portal.is_nether == False and portal.position.x == overworld_pos.x and portal.position.y == overworld_pos.y and portal.position.z == overworld_pos.z:
-            print_if(f"VIOLATION: Collision with portal {portal.label}")
-            return False
-        elif portal.is_nether == True and portal.position.x == nether_pos.x and portal.position.y == nether_pos.y and portal.position.z == nether_pos.z:
-            print_if(f"VIOLATION: Collision with portal {portal.label}")
-            return False
-
-    connections = get_connections()
     overworld_portal = Portal(label="NEW PORTAL (overworld)", position=overworld_pos, is_nether=False)
     nether_portal = Portal(label="NEW PORTAL (nether)", position=nether_pos, is_nether=True)
-    portals.append(overworld_portal)
-    portals.append(nether_portal)
-    new_connections = get_connections()
-    portals.pop()
-    portals.pop()
+    if not valid_portal_destination(overworld_portal, nether_pos):
+        report("VIOLATION: Invalid nether position. Must be within 16 XZ blocks after converting the overworld position.")
+        return False
+    
+    collision = overworld_positions.get(overworld_pos) or nether_positions.get(nether_pos)
+    if collision:
+        report(f"VIOLATION: Collision with portal {collision.label}")
+        return False
 
-    del new_connections["NEW PORTAL (overworld)"]
-    del new_connections["NEW PORTAL (nether)"]
+    # Only portals that can reach one of the new portals may change where they connect to
+    connections = get_base_connections()
+    affected = find_portals_reaching(nether_portal) + find_portals_reaching(overworld_portal)
+    # The new portals only need to be visible to lookups, so they go into the indexes but not the portal lists
+    overworld_index.insert(overworld_portal)
+    nether_index.insert(nether_portal)
+    new_connections = {}
+    for portal in affected:
+        new_connections[portal.label] = find_nether_connection(portal).label
+    nether_index.remove(nether_portal)
+    overworld_index.remove(overworld_portal)
 
     violations = []
-    for key in connections.keys():
+    for key in new_connections.keys():
         if connections[key] != new_connections[key]:
             old = f"{key} -> {connections[key]}"
             new = f"{key} -> {new_connections[key]}"
@@ -233,42 +444,65 @@ def check_new_portal(overworld_pos, nether_pos, silent=False):
         counter = 0
         for violation in violations:
             counter+=1
-            print_if(f"VIOLATION #{counter}")
-            print_if(f"Old: {violation[0]}")
-            print_if(f"New: {violation[1]}")
-            print_if()
+            report(f"VIOLATION #{counter}")
+            report(f"Old: {violation[0]}")
+            report(f"New: {violation[1]}")
+            report()
         return False
     
-    print_if("OK")
+    report("OK")
     return True
 
-if args.command == "show_connections":
-    if args.portal:
-        portal = get_portal_by_name(args.portal, True)
-        print(portal)
-        print_connections(portal)
-    else:
-        print_connections()
-elif args.command == "check_new_portal":
-    overworld_pos = parse_coords(args.overworld_coords)
-    nether_pos = convert_to_nether(overworld_pos) if args.nether_coords == "-" else parse_coords(args.nether_coords)
-    if args.nether_coords == "-":
-        nether_pos = Position(x=nether_pos.x, y=128, z=nether_pos.z)
-
-    valid_overworld_positions = []
-    if check_new_portal(overworld_pos, nether_pos, args.threshold):
-        valid_overworld_positions.append(overworld_pos)
+def main():
+    # Parse CLI arguments
+    parser = argparse.ArgumentParser(
+        prog='python npt.py',
+        description='Show all portal connections and test new portals.',
+    )
+    subparsers = parser.add_subparsers(help='The command to execute.', dest='command', required=True)
+    parser_show_connections = subparsers.add_parser('show_connections', help='Show all portal connections')
+    parser_show_connections.add_argument('-p', '--portal', help="Show only information for a specific portal")
+
+    parser_check_portal = subparsers.add_parser("check_new_portal", help="Checks if a portal can be constructed")
+    parser_check_portal.add_argument('overworld_coords', help='Overworld coordinates in x/y/z')
+    parser_check_portal.add_argument('nether_coords', help='Nether coordinates in x/y/z or - to use the converted coordinate on the nether roof')
+    parser_check_portal.add_argument('-t', '--threshold', help='Number of blocks to check around the input', type=int, default=0)
+
+    parser.add_argument('-d', '--data', default='./data/mcandy_portals.json', help="The JSON data to load.")
+    parser.add_argument('--stream', action='store_true', help="Parse the JSON data incrementally (requires ijson).")
+    args = parser.parse_args()
+
+    load_portals(args.data, args.stream)
+
+    if args.command == "show_connections":
+        if args.portal:
+            portal = get_portal_by_name(args.portal, True)
+            print(portal)
+            print_connections(portal)
+        else:
+            print_connections()
+    elif args.command == "check_new_portal":
+        overworld_pos = parse_coords(args.overworld_coords)
+        nether_pos = convert_to_nether(overworld_pos) if args.nether_coords == "-" else parse_coords(args.nether_coords)
+        if args.nether_coords == "-":
+            nether_pos = Position(x=nether_pos.x, y=128, z=nether_pos.z)
+
+        valid_overworld_positions = []
+        if check_new_portal(overworld_pos, nether_pos, args.threshold):
+            valid_overworld_positions.append(overworld_pos)
     
-    if args.threshold:
-        for x in range(-args.threshold, args.threshold+1):
-            for y in (-args.threshold, args.threshold+1):
-                for z in (-args.threshold, args.threshold+1):
+        if args.threshold:
+            # Walk outwards one shell at a time so the closest valid positions are listed first
+            for radius in range(1, args.threshold + 1):
+                for x, y, z in iter_shell_offsets(radius):
                     new_pos = Position(x=overworld_pos.x + x, y=overworld_pos.y + y, z=overworld_pos.z + z)
                     if check_new_portal(new_pos, nether_pos, silent=True):
                         valid_overworld_positions.append(new_pos)
 
-        if len(valid_overworld_positions) > 0:
-            for valid_position in valid_overworld_positions:
-                print(f"VALID: Overworld {valid_position.x}/{valid_position.y}/{valid_position.z} <-> Nether {nether_pos.x}/{nether_pos.y}/{nether_pos.z}")
-        else:
-            print("No valid positions found")
+            if len(valid_overworld_positions) > 0:
+                print("\n".join(f"VALID: Overworld {valid_position.x}/{valid_position.y}/{valid_position.z} <-> Nether {nether_pos.x}/{nether_pos.y}/{nether_pos.z}" for valid_position in valid_overworld_positions))
+            else:
+                print("No valid positions found")
+
+if __name__ == "__main__":
+    main()
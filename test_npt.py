@@ -0,0 +1,26 @@
+import math
+import unittest
+
+import npt
+
+
+class ConvertCoordinatesTest(unittest.TestCase):
+    def test_convert_to_nether_floors_like_math_floor(self):
+        for x in range(-100, 101):
+            pos = npt.convert_to_nether(npt.Position(x=x, y=64, z=-x))
+            self.assertEqual(pos, npt.Position(x=math.floor(x / 8), y=64, z=math.floor(-x / 8)))
+
+    def test_overworld_portal_cx_floors_like_math_floor(self):
+        for x in range(-100, 101):
+            portal = npt.Portal(label="test", position=npt.Position(x=x, y=64, z=-x), is_nether=False)
+            self.assertEqual((portal.cx, portal.cz), (math.floor(x / 8), math.floor(-x / 8)))
+
+    def test_nether_portal_cx_multiplies_by_eight(self):
+        for x in range(-100, 101):
+            portal = npt.Portal(label="test", position=npt.Position(x=x, y=64, z=-x), is_nether=True)
+            self.assertEqual((portal.cx, portal.cz), (x * 8, -x * 8))
+            self.assertEqual(npt.convert_to_overworld(portal.position), npt.Position(x=x * 8, y=64, z=-x * 8))
+
+
+if __name__ == "__main__":
+    unittest.main()